@@ -1,36 +1,165 @@
-from sys import exit, stdin
-from typing import Callable, List, Generator
-
-def range_F100(start: int, steps: int, op: Callable[[int], int]) -> Generator[tuple[int, bool], None, None]:
-    while steps > 0:
-        if steps > 100:
-            steps -= 100
-            yield 0, steps != 0  # slight optimization since we only care about zero
+from argparse import ArgumentParser, ArgumentTypeError
+from dataclasses import dataclass, replace
+from io import BytesIO
+from sys import exit, stdin, stderr
+from typing import BinaryIO, Generator, Iterable, List, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+@dataclass
+class DialCounts:
+    position: int
+    stops_at_zero: int = 0
+    clicks_at_zero: int = 0
+
+    def rotate(self, steps: int) -> None:
+        if steps >= 0:
+            passes, self.position = divmod(self.position + steps, 100)
         else:
-            steps -= 1
-            start = op(start) % 100
-            yield start, steps != 0
+            passes = ((100 - self.position) % 100 - steps) // 100
+            self.position = (self.position + steps) % 100
 
-def turn_dial(current: int, instr: str) -> Generator[tuple[int, bool], None, None]:
+        self.clicks_at_zero += passes
+        self.stops_at_zero += self.position == 0
+
+def parse_instruction(instr: str) -> int:
     match instr[0]:
         case "L":
-            yield from range_F100(current, int(instr[1:]), lambda x: x - 1)
+            return -int(instr[1:])
         case "R":
-            yield from range_F100(current, int(instr[1:]), lambda x: x + 1)
+            return int(instr[1:])
         case _:
             raise ValueError(f"Invalid instruction: {instr}")
 
-def turn_dials(directions: List[str], dial_position: int) -> Generator[tuple[int, bool], None, None]:
+def turn_dial(current: int, instr: str) -> tuple[int, int]:
+    counts = DialCounts(current)
+    counts.rotate(parse_instruction(instr))
+
+    return counts.position, counts.clicks_at_zero
+
+def turn_dials(directions: Iterable[str], dial_position: int) -> DialCounts:
+    counts = DialCounts(dial_position)
+
     for direction in directions:
-        for new_position, is_intermediate in turn_dial(dial_position, direction):
-            dial_position = new_position
-            yield dial_position, is_intermediate
+        counts.rotate(parse_instruction(direction))
+
+    return counts
+
+INSTRUCTION_BYTES = np.isin(np.arange(256), np.frombuffer(b"LR0123456789 \t\r\n", dtype=np.uint8))
+TURN_SIGNS = bytes.maketrans(b"LR", b"-+")
+
+def parse_rotations(content: bytes) -> NDArray[np.int64]:
+    if not (content := content.strip()):
+        return np.zeros(0, dtype=np.int64)
+
+    chars = np.frombuffer(b" " + content + b" ", dtype=np.uint8)
+
+    if np.any(np.bincount(chars, minlength=256)[~INSTRUCTION_BYTES]):
+        raise ValueError("Invalid instruction: unexpected character")
+
+    turns = np.flatnonzero((chars == ord("L")) | (chars == ord("R")))
+
+    if not np.all((chars[turns + 1] >= ord("0")) & (chars[turns + 1] <= ord("9"))):
+        raise ValueError("Invalid instruction: turn without a step count")
+    if not np.all(chars[turns - 1] <= ord(" ")):
+        raise ValueError("Invalid instruction: turns must be whitespace separated")
+
+    try:
+        steps = np.fromstring(content.translate(TURN_SIGNS), dtype=np.int64, sep=" ")
+    except ValueError as e:
+        raise ValueError(f"Invalid instruction: {e}") from e
+
+    if len(steps) != len(turns):
+        raise ValueError("Invalid instruction: step count without a turn")
+    if np.any(np.abs(steps) >= 10 ** 18):
+        raise ValueError("Invalid instruction: step count too large")
+
+    return steps
+
+def turn_dials_batch(rotations: NDArray[np.int64], dial_position: int) -> DialCounts:
+    # every full turn passes zero exactly once, so only the remainders need the running sum,
+    # which keeps it far away from int64 overflow; the full turns are added up as exact ints
+    full_turns, remainders = np.divmod(np.abs(rotations), 100)
+    remainders = np.where(rotations >= 0, remainders, -remainders)
+
+    unwrapped = dial_position + np.cumsum(remainders)
+    previous = np.concatenate(([dial_position], unwrapped[:-1]))
+    clicks = np.where(
+        remainders >= 0,
+        unwrapped // 100 - previous // 100,
+        (previous - 1) // 100 - (unwrapped - 1) // 100  # left turns count the zero they land on, not the one they leave
+    )
+    positions = unwrapped % 100
+
+    return DialCounts(
+        int(positions[-1]) if len(positions) else dial_position,
+        int(np.count_nonzero(positions == 0)),
+        int(clicks.sum()) + sum(full_turns.tolist())
+    )
+
+def parse_instruction_bytes(instr: bytes) -> int:
+    if instr.startswith(b"L"):
+        return -int(instr[1:])
+    elif instr.startswith(b"R"):
+        return int(instr[1:])
+    else:
+        raise ValueError(f"Invalid instruction: {instr.decode(errors='replace')}")
+
+def read_instructions(input: BinaryIO, chunk_size: int = 1 << 16) -> Generator[bytes, None, None]:
+    # read1 hands over whatever a pipe has buffered instead of waiting for a full chunk
+    read = getattr(input, "read1", input.read)
+    remainder = b""
+
+    while chunk := read(chunk_size):
+        instrs = (remainder + chunk).split()
+        remainder = instrs.pop() if instrs and not chunk[-1:].isspace() else b""
+
+        yield from instrs
+
+    if remainder:
+        yield remainder
+
+def stream_dials(
+    input: BinaryIO,
+    dial_position: int,
+    report_every: int | None = None,
+    chunk_size: int = 1 << 16
+) -> Generator[Tuple[DialCounts, bool], None, None]:
+    counts = DialCounts(dial_position)
+    instructions = 0
+
+    # partial counts are yielded as soon as they are reached, the final ones tagged at the end
+    for instr in read_instructions(input, chunk_size):
+        counts.rotate(parse_instruction_bytes(instr))
+        instructions += 1
+
+        if report_every is not None and instructions % report_every == 0:
+            yield replace(counts), False
+
+    yield counts, True
+
+def positive_int(value: str) -> int:
+    if (number := int(value)) < 1:
+        raise ArgumentTypeError(f"{value} is not a positive number")
+    return number
 
 def main() -> int:
-    lines = [line.strip() for line in stdin if line.strip()]
+    parser = ArgumentParser()
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--report-every", type=positive_int, metavar="N", help="report partial counts every N instructions")
+    mode.add_argument("--batch", action="store_true", help="evaluate the whole input at once with numpy")
+    args = parser.parse_args()
+
+    if args.batch:
+        counts = turn_dials_batch(parse_rotations(stdin.buffer.read()), 50)
+    else:
+        for counts, final in stream_dials(stdin.buffer, 50, args.report_every):
+            if not final:
+                print(counts.stops_at_zero, counts.clicks_at_zero, file=stderr, flush=True)
 
-    print(sum(1 for new_position, is_intermediate in turn_dials(lines, 50) if new_position == 0 and not is_intermediate))
-    print(sum(1 for new_position, _ in turn_dials(lines, 50) if new_position == 0))
+    print(counts.stops_at_zero)
+    print(counts.clicks_at_zero)
 
     return 0
 
@@ -39,7 +168,7 @@ if __name__ == "__main__":
 
 # -------- Tests --------
 
-from pytest import fixture
+from pytest import fixture, raises
 
 class Test:
     @fixture
@@ -60,7 +189,59 @@ class Test:
         return list(map(str.strip, lines))
 
     def test_example_1(self, example_input: List[str]) -> None:
-        assert sum(1 for new_position, is_intermediate in turn_dials(example_input, 50) if new_position == 0 and not is_intermediate) == 3
+        assert turn_dials(example_input, 50).stops_at_zero == 3
 
     def test_example_2(self, example_input: List[str]) -> None:
-        assert sum(1 for new_position, _ in turn_dials(example_input, 50) if new_position == 0) == 6
+        assert turn_dials(example_input, 50).clicks_at_zero == 6
+
+    def test_large_rotations(self) -> None:
+        assert turn_dial(50, "R999999") == (49, 10000)
+        assert turn_dial(50, "L1000") == (50, 10)
+        assert turn_dial(0, "L100") == (0, 1)
+        assert turn_dial(0, "L5") == (95, 0)
+        assert turn_dial(5, "L5") == (0, 1)
+
+    def test_stream(self, example_input: List[str]) -> None:
+        content = BytesIO("\n".join(example_input).encode())
+        reports = list(stream_dials(content, 50, report_every=4, chunk_size=5))
+
+        assert [(c.stops_at_zero, c.clicks_at_zero, final) for c, final in reports] == \
+            [(1, 2, False), (3, 5, False), (3, 6, True)]
+
+    def test_stream_live_pipe(self) -> None:
+        # a pipe that only ever has one instruction ready, like a slow producer
+        class Pipe:
+            def __init__(self, lines: List[bytes]) -> None:
+                self.lines = lines
+
+            def read1(self, size: int) -> bytes:
+                return self.lines.pop(0) if self.lines else b""
+
+            def read(self, size: int) -> bytes:
+                raise AssertionError("read waits for a full chunk")
+
+        reports = stream_dials(Pipe([b"R50\n", b"L5\n", b"R5\n"]), 50, report_every=1)  # type: ignore[arg-type]
+
+        assert next(reports) == (DialCounts(0, 1, 1), False)
+        assert [(c.position, final) for c, final in reports] == [(95, False), (0, False), (0, True)]
+
+    def test_report_every_must_be_positive(self) -> None:
+        assert positive_int("3") == 3
+
+        for value in ["0", "-2"]:
+            with raises(ArgumentTypeError):
+                positive_int(value)
+
+    def test_batch(self, example_input: List[str]) -> None:
+        rotations = parse_rotations(" ".join(example_input + ["R999999"]).encode())
+        counts = turn_dials_batch(rotations, 50)
+
+        assert rotations.tolist() == [parse_instruction(instr) for instr in example_input + ["R999999"]]
+        assert (counts.position, counts.stops_at_zero, counts.clicks_at_zero) == (31, 3, 10006)
+
+    def test_batch_huge_rotations(self) -> None:
+        instructions = ["R900000000000000000"] * 11 + ["L999999999999999999", "L50"]
+        counts = turn_dials_batch(parse_rotations(" ".join(instructions).encode()), 50)
+
+        assert counts == turn_dials(instructions, 50)
+        assert counts.clicks_at_zero == 109000000000000000
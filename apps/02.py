@@ -1,8 +1,10 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from sys import exit, stdin, maxsize
 from io import StringIO
-from typing import Generator, List, TextIO, Set
+from typing import Dict, Generator, List, TextIO, Set
 from functools import reduce
+from itertools import combinations
+from math import prod
 
 @dataclass
 class IdRange:
@@ -35,6 +37,65 @@ class IdRange:
 
         return result
 
+    def invalid_id_sum(self, max_repeats: int | None = None) -> int:
+        return REPEATED_ID_INDEX.invalid_id_sum(self, max_repeats)
+
+@dataclass(frozen=True, slots=True)
+class RepeatedIdGroup:
+    required_repeats: int
+    sign: int
+    smallest_prefix: int
+    multiplier: int
+
+    @staticmethod
+    def build(block: int, repeats: int, required_repeats: int = 2, sign: int = 1) -> 'RepeatedIdGroup':
+        smallest_prefix: int = 10 ** (block - 1)
+        multiplier: int = (10 ** (block * repeats) - 1) // (10 * smallest_prefix - 1)
+
+        return RepeatedIdGroup(required_repeats, sign, smallest_prefix, multiplier)
+
+    def id_sum(self, first: int, last: int) -> int:
+        lowest = max(self.smallest_prefix, -(-first // self.multiplier))
+        highest = min(10 * self.smallest_prefix - 1, last // self.multiplier)
+
+        if lowest > highest:
+            return 0
+        return self.sign * self.multiplier * (lowest + highest) * (highest - lowest + 1) // 2
+
+@dataclass
+class RepeatedIdIndex:
+    widths: Dict[int, List[RepeatedIdGroup]] = field(default_factory=dict)
+
+    def groups(self, width: int) -> List[RepeatedIdGroup]:
+        if width not in self.widths:
+            self.widths[width] = build_repeated_id_groups(width)
+
+        return self.widths[width]
+
+    def invalid_id_sum(self, id_range: IdRange, max_repeats: int | None = None) -> int:
+        return sum(
+            group.id_sum(id_range.first, id_range.last)
+            for width in range(len(str(id_range.first)), len(str(id_range.last)) + 1)
+            for group in self.groups(width)
+            if max_repeats is None or group.required_repeats <= max_repeats
+        )
+
+def build_repeated_id_groups(width: int) -> List[RepeatedIdGroup]:
+    primes = [q for q in range(2, width + 1) if width % q == 0 and all(q % d != 0 for d in range(2, q))]
+    groups = []
+
+    # an id repeated `r` times is also repeated every prime `q` dividing `r` times, so the ids
+    # allowed by `max_repeats` are those repeated by some prime up to it; inclusion-exclusion over
+    # sets of primes counts each once, a set needing all its primes to be allowed
+    for size in range(1, len(primes) + 1):
+        for chosen in combinations(primes, size):
+            repeats = prod(chosen)
+            groups.append(RepeatedIdGroup.build(width // repeats, repeats, max(chosen), (-1) ** (size + 1)))
+
+    return groups
+
+REPEATED_ID_INDEX = RepeatedIdIndex()
+
 def parse_id_ranges(input: TextIO) -> List[IdRange]:
     return [
         IdRange(*map(int, s.split("-")))
@@ -45,8 +106,8 @@ def parse_id_ranges(input: TextIO) -> List[IdRange]:
 def main() -> int:
     id_ranges = parse_id_ranges(stdin)
 
-    print(sum(id for id_range in id_ranges for id in id_range.invalid_ids(2)))
-    print(sum(id for id_range in id_ranges for id in id_range.invalid_ids()))
+    print(sum(id_range.invalid_id_sum(2) for id_range in id_ranges))
+    print(sum(id_range.invalid_id_sum() for id_range in id_ranges))
 
     return 0
 
@@ -73,3 +134,28 @@ class Test:
 
     def test_example_2(self, example_input: List[IdRange]) -> None:
         assert sum(id for id_range in example_input for id in id_range.invalid_ids()) == 4174379265
+
+    def test_invalid_id_sum(self, example_input: List[IdRange]) -> None:
+        id_ranges = example_input + [IdRange(1, 1234567), IdRange(1111, 1111), IdRange(0, 99)]
+
+        for max_repeats in [2, 3, None]:
+            for id_range in id_ranges:
+                assert id_range.invalid_id_sum(max_repeats) == sum(id_range.invalid_ids(max_repeats))
+
+    def test_repeated_id_index(self) -> None:
+        index = RepeatedIdIndex()
+
+        for max_repeats in [2, 3, 5, None]:
+            assert index.invalid_id_sum(IdRange(1, 10 ** 10 - 1), max_repeats) == \
+                sum(IdRange(1, 10 ** 10 - 1).invalid_ids(max_repeats))
+
+    def test_repeated_id_index_wide_ranges(self) -> None:
+        index = RepeatedIdIndex()
+
+        # ranges too wide to enumerate must still split additively at every width boundary
+        for first, last in [(10 ** 13, 10 ** 14 - 1), (123456789, 98765432109876543210)]:
+            for max_repeats in [2, 3, 5, None]:
+                middle = (first + last) // 2
+                assert index.invalid_id_sum(IdRange(first, last), max_repeats) == \
+                    index.invalid_id_sum(IdRange(first, middle), max_repeats) + \
+                    index.invalid_id_sum(IdRange(middle + 1, last), max_repeats)
@@ -1,28 +1,96 @@
+from dataclasses import dataclass
 from sys import exit, stdin
-from typing import Dict, List
+from typing import Any, List, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
+@dataclass(frozen=True, slots=True)
+class BankMatrix:
+    digits: NDArray[np.uint8]
+    offsets: NDArray[np.intp]
+
+def select_batteries(batteries: str, counts: Sequence[int]) -> List[int]:
+    if any(not 0 < count <= len(batteries) for count in counts):
+        raise ValueError(f"cannot pick {counts} batteries from a bank of {len(batteries)}")
+
+    picks = [list[str]() for _ in counts]
+
+    for i, battery in enumerate(batteries):
+        remaining = len(batteries) - i
+
+        for picked, count in zip(picks, counts):
+            while picked and picked[-1] < battery and len(picked) + remaining > count:
+                picked.pop()
+            if len(picked) < count:
+                picked.append(battery)
+
+    return [int("".join(picked)) for picked in picks]
 
 def max_batteries(batteries: str, count: int) -> int:
-    so_far: Dict[int, int] = {}
+    return select_batteries(batteries, [count])[0]
+
+def parse_bank_matrix(content: bytes) -> BankMatrix:
+    # blanks around or inside a line are dropped like the old per-line strip() did
+    if not (content := content.translate(None, b" \t\r\v\f").strip()):
+        return BankMatrix(np.zeros((0, 0), dtype=np.uint8), np.zeros(0, dtype=np.intp))
+
+    chars = np.frombuffer(content, dtype=np.uint8)
+    width = content.find(b"\n") if b"\n" in content else len(content)
+
+    if not np.all((chars == ord("\n")) | ((chars >= ord("0")) & (chars <= ord("9")))):
+        raise ValueError("battery banks must only contain digits")
+
+    breaks = np.flatnonzero(chars == ord("\n"))
+
+    # every bank has the same length, so the input is already a matrix with a newline column; any
+    # extra newline would be a blank line, which only the ragged path below skips
+    if (len(chars) + 1) % (width + 1) == 0 and len(breaks) == (len(chars) + 1) // (width + 1) - 1 \
+            and np.all(chars[width::width + 1] == ord("\n")):
+        digits = np.append(chars, ord("\n")).reshape(-1, width + 1)[:, :width] - ord("0")
 
-    for remaining_picks in range(0, count):
-        max_previous_value = 0
-        next_so_far = {}
+        return BankMatrix(digits.astype(np.uint8), np.zeros(len(digits), dtype=np.intp))
 
-        for i in reversed(range(len(batteries) - remaining_picks)):
-            if so_far.get(i + 1, 0) > max_previous_value:
-                max_previous_value = so_far[i + 1]
+    starts, ends = np.append(0, breaks + 1), np.append(breaks, len(chars))
+    starts, ends = starts[ends > starts], ends[ends > starts]
+    lengths, width = ends - starts, int((ends - starts).max())
 
-            next_so_far[i] = int(batteries[i] + str(max_previous_value if max_previous_value > 0 else ""))
+    # right-align the banks so every row ends in the last column and remember where each begins
+    offsets = width - lengths
+    digits = np.zeros((len(lengths), width), dtype=np.uint8)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    digits[rows, np.repeat(offsets, lengths) + positions] = chars[np.repeat(starts, lengths) + positions] - ord("0")
 
-        so_far = next_so_far
+    return BankMatrix(digits, offsets.astype(np.intp))
 
-    return max(so_far.values())
+def select_bank_matrix(banks: BankMatrix, count: int) -> tuple[NDArray[Any], int]:
+    rows, width = banks.digits.shape
+
+    if rows == 0:
+        return np.zeros(0, dtype=np.int64), 0
+    if count < 1 or np.any(width - banks.offsets < count):
+        raise ValueError(f"cannot pick {count} batteries from every bank")
+
+    values = np.zeros(rows, dtype=np.int64 if count <= 18 else object)
+    rows_index, start = np.arange(rows), banks.offsets
+
+    for pick in range(count):
+        lowest, stop = int(start.min()), width - count + pick + 1
+        columns = np.arange(lowest, stop)
+        window = np.where(columns >= start[:, None], banks.digits[:, lowest:stop].view(np.int8), -1)
+        chosen = lowest + window.argmax(axis=1)
+
+        values = values * 10 + banks.digits[rows_index, chosen].astype(values.dtype)
+        start = chosen + 1
+
+    return values, sum(values.tolist())
 
 def main() -> int:
-    banks = [line.strip() for line in stdin if line.strip()]
+    banks = parse_bank_matrix(stdin.buffer.read())
 
-    print(sum(b for b in [max_batteries(batteries, 2) for batteries in banks]))
-    print(sum(b for b in [max_batteries(batteries, 12) for batteries in banks]))
+    print(select_bank_matrix(banks, 2)[1])
+    print(select_bank_matrix(banks, 12)[1])
 
     return 0
 
@@ -50,3 +118,29 @@ class Test:
 
     def test_example_2(self, example_input: List[str]) -> None:
         assert sum(max_batteries(batteries, 12) for batteries in example_input) == 3121910778619
+
+    def test_select_batteries(self, example_input: List[str]) -> None:
+        assert select_batteries(example_input[0], [1, 2, 12, 15]) == [9, 98, 987654321111, 987654321111111]
+        assert select_batteries("1" * 500 + "9" * 500, [300]) == [int("9" * 300)]
+
+    def test_bank_matrix(self, example_input: List[str]) -> None:
+        for banks in [example_input, example_input + ["91", "1234567890123"]]:
+            matrix = parse_bank_matrix("\n".join(banks).encode())
+
+            for count in [1, 2]:
+                values, total = select_bank_matrix(matrix, count)
+
+                assert values.tolist() == [max_batteries(batteries, count) for batteries in banks]
+                assert total == sum(values.tolist())
+
+    def test_bank_matrix_line_endings(self, example_input: List[str]) -> None:
+        matrix = parse_bank_matrix(("\r\n".join(example_input) + "\r\n").encode())
+
+        assert select_bank_matrix(matrix, 12)[1] == 3121910778619
+        assert select_bank_matrix(parse_bank_matrix(b""), 12)[1] == 0
+        assert select_bank_matrix(parse_bank_matrix(b"\r\n"), 2)[1] == 0
+
+    def test_bank_matrix_blank_lines(self) -> None:
+        assert select_bank_matrix(parse_bank_matrix(b"12\n\n\n\n34"), 2)[1] == 46
+        assert select_bank_matrix(parse_bank_matrix(b"12 \n\t34\t\n\n"), 2)[1] == 46
+        assert select_bank_matrix(parse_bank_matrix(b"12\n\n34\n"), 1)[0].tolist() == [2, 4]
@@ -1,52 +1,85 @@
+from dataclasses import dataclass
 from sys import exit, stdin
-from typing import Dict, TextIO
+from typing import List, TextIO
 from io import StringIO
 
-type Coord = tuple[int, int]
+import numpy as np
+from numpy.typing import NDArray
 
-def parse_map(input: TextIO) -> Dict[Coord, int]:
+@dataclass(frozen=True, slots=True)
+class PaperMap:
+    cells: NDArray[np.bool_]
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.cells))
+
+def parse_map(input: TextIO) -> PaperMap:
     lines = [line.strip() for line in input if line.strip()]
+    width = max((len(line) for line in lines), default=0)
+
+    content = "".join(line.ljust(width, ".") for line in lines).encode()
+
+    return PaperMap((np.frombuffer(content, dtype=np.uint8) == ord("@")).reshape(len(lines), width))
+
+def count_adjacent_papers(map: PaperMap) -> NDArray[np.uint8]:
+    height, width = map.cells.shape
+    padded = np.pad(map.cells, 1).view(np.uint8)
+    counts = np.zeros((height, width), dtype=np.uint8)
+
+    for dy in range(3):
+        for dx in range(3):
+            if dy != 1 or dx != 1:
+                counts += padded[dy:dy + height, dx:dx + width]
+
+    return counts
+
+def accessible_papers(map: PaperMap) -> NDArray[np.bool_]:
+    return map.cells & (count_adjacent_papers(map) < 4)
+
+def remove_accessible_paper(map: PaperMap) -> PaperMap:
+    return PaperMap(map.cells & ~accessible_papers(map))
+
+def peel_accessible_paper(map: PaperMap) -> tuple[PaperMap, List[int]]:
+    height, width = map.cells.shape
+    stride = width + 2
+    neighbours = np.array([dy * stride + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx])
+
+    # flat, zero-padded copies so every neighbour index of a real cell is in bounds
+    present = np.pad(map.cells, 1).ravel()
+    counts = np.pad(count_adjacent_papers(map), 1).ravel().astype(np.int8)
+    frontier = np.flatnonzero(present & (counts < 4))
+    present[frontier] = False
+    removals = []
 
-    return {
-        (x, y): 1
-        for y, line in enumerate(lines)
-        for x, char in enumerate(line)
-        if char == "@"
-    }
-
-def is_accessible_paper(map: Dict[Coord, int], coord: Coord) -> int:
-    x, y = coord
-    adjacent_papers = map.get((x - 1, y - 1), 0) \
-        + map.get((x - 1, y), 0) \
-        + map.get((x - 1, y + 1), 0) \
-        + map.get((x, y - 1), 0) \
-        + map.get((x, y + 1), 0) \
-        + map.get((x + 1, y - 1), 0) \
-        + map.get((x + 1, y), 0) \
-        + map.get((x + 1, y + 1), 0)
-
-    return adjacent_papers < 4
-
-def remove_accessible_paper(map: Dict[Coord, int]) -> Dict[Coord, int]:
-    return {
-        coord: char
-        for coord, char in map.items()
-        if not is_accessible_paper(map, coord)
-    }
-
-def remove_all_accessible_paper(map: Dict[Coord, int]) -> Dict[Coord, int]:
-    cleaned_map = map
-
-    while (new_map := remove_accessible_paper(cleaned_map)) != cleaned_map:
-        cleaned_map = new_map
-
-    return cleaned_map
+    # only a paper whose count just dropped below four can become accessible in the next
+    # round, so each round touches the neighbours of the removed papers and nothing else
+    while len(frontier) > 0:
+        removals.append(len(frontier))
+
+        for offset in neighbours:
+            counts[frontier + offset] -= 1
+
+        next_frontier = []
+
+        for offset in neighbours:
+            candidates = frontier + offset
+            candidates = candidates[present[candidates] & (counts[candidates] < 4)]
+            present[candidates] = False
+            next_frontier.append(candidates)
+
+        frontier = np.concatenate(next_frontier)
+
+    return PaperMap(present.reshape(height + 2, stride)[1:-1, 1:-1].copy()), removals
+
+def remove_all_accessible_paper(map: PaperMap) -> PaperMap:
+    return peel_accessible_paper(map)[0]
 
 def main() -> int:
     map = parse_map(stdin)
+    _, removals = peel_accessible_paper(map)
 
-    print(len(map) - len(remove_accessible_paper(map)))
-    print(len(map) - len(remove_all_accessible_paper(map)))
+    print(removals[0] if removals else 0)
+    print(sum(removals))
 
     return 0
 
@@ -83,3 +116,15 @@ class Test:
         map = parse_map(example_input)
 
         assert len(map) - len(remove_all_accessible_paper(map)) == 43
+
+    def test_count_adjacent_papers(self) -> None:
+        map = parse_map(StringIO("@@@\n@.@\n.@@"))
+
+        assert count_adjacent_papers(map).tolist() == [[2, 4, 2], [3, 7, 4], [2, 3, 2]]
+
+    def test_peel_accessible_paper(self, example_input: TextIO) -> None:
+        map = parse_map(example_input)
+        cleaned_map, removals = peel_accessible_paper(map)
+
+        assert removals == [13, 12, 7, 5, 2, 1, 1, 1, 1]
+        assert len(cleaned_map) == len(map) - 43
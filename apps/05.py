@@ -1,8 +1,14 @@
+from argparse import ArgumentParser
 from sys import exit, stdin
-from typing import Callable, List, TextIO
-from dataclasses import dataclass
+from typing import Callable, Generator, Iterable, List, TextIO
+from dataclasses import dataclass, field
 from itertools import takewhile
 from io import StringIO
+from bisect import bisect_right
+from random import Random
+from time import perf_counter
+
+from sortedcontainers import SortedDict # type: ignore
 
 @dataclass
 class IngredientRange:
@@ -30,27 +36,137 @@ def parse_ingredients(input: TextIO) -> tuple[List[IngredientRange], List[int]]:
 def is_fresh(ingredient: int, ranges: List[IngredientRange]) -> bool:
     return any(r.start <= ingredient <= r.end for r in ranges)
 
-def compact_ranges(ranges: List[IngredientRange]) -> List[IngredientRange]:
-    result: List[IngredientRange] = []
+@dataclass
+class IngredientRangeSet:
+    starts: List[int] = field(default_factory=list)
+    ends: List[int] = field(default_factory=list)
+
+    @staticmethod
+    def from_ranges(ranges: Iterable[IngredientRange]) -> 'IngredientRangeSet':
+        result = IngredientRangeSet()
+
+        for r in sorted(ranges, key=lambda r: r.start):
+            if result.ends and r.start <= result.ends[-1] + 1:
+                result.ends[-1] = max(result.ends[-1], r.end)
+            else:
+                result.starts.append(r.start)
+                result.ends.append(r.end)
+
+        return result
+
+    def __contains__(self, ingredient: int) -> bool:
+        i = bisect_right(self.starts, ingredient) - 1
+
+        return i >= 0 and ingredient <= self.ends[i]
+
+    def __iter__(self) -> Generator[IngredientRange, None, None]:
+        for start, end in zip(self.starts, self.ends):
+            yield IngredientRange(start, end)
+
+    def __len__(self) -> int:
+        return sum(self.ends) - sum(self.starts) + len(self.starts)
+
+    def count_fresh(self, ingredients: Iterable[int]) -> int:
+        fresh, i = 0, 0
+
+        for ingredient in sorted(ingredients):
+            while i < len(self.ends) and self.ends[i] < ingredient:
+                i += 1
+            if i == len(self.ends):
+                break
+            if self.starts[i] <= ingredient:
+                fresh += 1
+
+        return fresh
+
+@dataclass
+class MutableIngredientRangeSet:
+    ranges: SortedDict = field(default_factory=SortedDict)
+    total: int = 0
+
+    def add(self, r: IngredientRange) -> None:
+        start, end = r.start, r.end
+        i = self.ranges.bisect_right(start) - 1
+
+        if i < 0 or self.ranges.peekitem(i)[1] < start - 1:
+            i += 1
 
-    for current in ranges:
-        to_merge = [other for other in result if current.mergable(other)]
-        to_merge.append(current)
+        while i < len(self.ranges) and (other := self.ranges.peekitem(i))[0] <= end + 1:
+            start, end = min(start, other[0]), max(end, other[1])
+            self.ranges.popitem(i)
+            self.total -= other[1] - other[0] + 1
 
-        result = [other for other in result if not current.mergable(other)]
-        result.append(IngredientRange(
-            min(r.start for r in to_merge),
-            max(r.end for r in to_merge))
-        )
+        self.ranges[start] = end
+        self.total += end - start + 1
 
-    return result
+    def remove(self, r: IngredientRange) -> None:
+        i = self.ranges.bisect_right(r.start) - 1
+
+        if i < 0 or self.ranges.peekitem(i)[1] < r.start:
+            i += 1
+
+        while i < len(self.ranges) and (other := self.ranges.peekitem(i))[0] <= r.end:
+            self.ranges.popitem(i)
+            self.total -= other[1] - other[0] + 1
+
+            if other[0] < r.start:
+                self.ranges[other[0]] = r.start - 1
+                self.total += r.start - other[0]
+                i += 1
+            if other[1] > r.end:
+                self.ranges[r.end + 1] = other[1]
+                self.total += other[1] - r.end
+                i += 1
+
+    def __contains__(self, ingredient: int) -> bool:
+        i = self.ranges.bisect_right(ingredient) - 1
+
+        return i >= 0 and ingredient <= int(self.ranges.peekitem(i)[1])
+
+    def __iter__(self) -> Generator[IngredientRange, None, None]:
+        for start, end in self.ranges.items():
+            yield IngredientRange(start, end)
+
+    def __len__(self) -> int:
+        return self.total
+
+def replay_benchmark(operations: int, seed: int = 0) -> float:
+    rng = Random(seed)
+    replay = [
+        (rng.randrange(5), IngredientRange(start, start + rng.randrange(1_000_000)))
+        for start in (rng.randrange(1_000_000_000) for _ in range(operations))
+    ]
+    fresh_ranges = MutableIngredientRangeSet()
+    started = perf_counter()
+
+    for op, r in replay:
+        match op:
+            case 0 | 1:
+                fresh_ranges.add(r)
+            case 2:
+                fresh_ranges.remove(r)
+            case _:
+                _ = r.start in fresh_ranges
+
+    return perf_counter() - started
+
+def compact_ranges(ranges: List[IngredientRange]) -> List[IngredientRange]:
+    return list(IngredientRangeSet.from_ranges(ranges))
 
 def main() -> int:
+    parser = ArgumentParser()
+    parser.add_argument("--benchmark", type=int, metavar="N", help="replay N random range updates and queries")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        print(f"{args.benchmark} operations in {replay_benchmark(args.benchmark):.2f}s")
+        return 0
+
     ranges, ingredients = parse_ingredients(stdin)
-    ranges = compact_ranges(ranges)
+    fresh_ranges = IngredientRangeSet.from_ranges(ranges)
 
-    print(sum(1 for ingredient in ingredients if is_fresh(ingredient, ranges)))
-    print(sum(len(r) for r in ranges))
+    print(fresh_ranges.count_fresh(ingredients))
+    print(len(fresh_ranges))
 
     return 0
 
@@ -91,3 +207,31 @@ class Test:
         ingredient_ranges, _ = example_input
 
         assert sum(len(r) for r in compact_ranges(ingredient_ranges)) == 14
+
+    def test_ingredient_range_set(self, example_input: tuple[List[IngredientRange], List[int]]) -> None:
+        ingredient_ranges, ingredients = example_input
+        fresh_ranges = IngredientRangeSet.from_ranges(ingredient_ranges)
+
+        assert list(fresh_ranges) == [IngredientRange(3, 5), IngredientRange(10, 20)]
+        assert [ingredient in fresh_ranges for ingredient in ingredients] == [False, True, False, True, True, False]
+        assert fresh_ranges.count_fresh(ingredients + [3, 20, 21]) == 5
+        assert len(fresh_ranges) == 14
+
+    def test_mutable_ingredient_range_set(self) -> None:
+        rng, expected = Random(2025), set[int]()
+        fresh_ranges = MutableIngredientRangeSet()
+
+        for _ in range(500):
+            start = rng.randrange(100)
+            r = IngredientRange(start, start + rng.randrange(10))
+
+            if rng.randrange(3) > 0:
+                fresh_ranges.add(r)
+                expected.update(range(r.start, r.end + 1))
+            else:
+                fresh_ranges.remove(r)
+                expected.difference_update(range(r.start, r.end + 1))
+
+            assert len(fresh_ranges) == len(expected)
+            assert all((ingredient in fresh_ranges) == (ingredient in expected) for ingredient in range(-1, 112))
+            assert all(a.end + 1 < b.start for a, b in zip(fresh_ranges, list(fresh_ranges)[1:]))
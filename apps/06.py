@@ -1,40 +1,188 @@
+from dataclasses import dataclass
 from sys import exit, stdin
-from typing import List, Generator
+from typing import Any, BinaryIO, List, Generator
 from math import prod
-from re import match
+from mmap import mmap, ACCESS_READ
 
-def parse_prefixed_int(s: str) -> str:
-    if (m := match(r"\s*\d+", s)) is not None:
-        return m.group(0)
-    raise ValueError(f"invalid cephalopod number: {s[:10]}...")
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from numpy.typing import NDArray
 
-def shuffle_numbers(numbers: List[str]) -> List[str]:
-    max_length = max(len(num) for num in numbers)
-    numbers = [num.ljust(max_length, " ") for num in numbers]
+@dataclass(frozen=True, slots=True)
+class Problem:
+    op: str
+    rows: List[int]
+    columns: List[int]
 
-    return [
-        "".join([numbers[row][column] for row in range(len(numbers))])
-        for column in range(max_length)
-    ]
+    def answer(self, rtl: bool = False) -> int:
+        operands = self.columns if rtl else self.rows
 
-def solve_homework(lines: List[str], rtl: bool = False) -> Generator[int, None, None]:
-    for i, op in [(i, op) for i, op in enumerate(lines[-1]) if op in "*+"]:
-        parts = [parse_prefixed_int(part[i:]) for part in lines[:-1]]
-
-        if rtl:
-            parts = shuffle_numbers(parts)
-
-        match op:
+        match self.op:
             case "*":
-                yield prod(map(int, parts))
+                return prod(operands)
             case "+":
-                yield sum(map(int, parts))
+                return sum(operands)
+            case _:
+                raise ValueError(f"invalid cephalopod operator: {self.op}")
+
+def parse_worksheet(lines: List[str]) -> Generator[Problem, None, None]:
+    starts = [i for i, op in enumerate(lines[-1]) if op in "*+"]
+    rows = [line.rstrip("\r\n").encode() for line in lines[:-1]]
+    width = max(len(row) for row in rows)
+    rows = [row.ljust(width) for row in rows]
+
+    for start, stop in zip(starts, starts[1:] + [width + 1]):
+        block = [row[start:stop - 1] for row in rows]
+
+        yield Problem(
+            lines[-1][start],
+            [int(part) for part in block],
+            [int(digits) for column in zip(*block) if (digits := bytes(column).strip())]
+        )
+
+def solve_homework(lines: List[str], rtl: bool = False) -> Generator[int, None, None]:
+    for problem in parse_worksheet(lines):
+        yield problem.answer(rtl)
+
+def solve_worksheet(lines: List[str]) -> tuple[int, int]:
+    ltr, rtl = 0, 0
+
+    for problem in parse_worksheet(lines):
+        ltr += problem.answer()
+        rtl += problem.answer(rtl=True)
+
+    return ltr, rtl
+
+POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+
+def load_worksheet(input: BinaryIO) -> NDArray[np.uint8]:
+    try:
+        content: bytes | mmap = mmap(input.fileno(), 0, access=ACCESS_READ)
+    except (OSError, ValueError):
+        content = input.read()
+
+    return worksheet_matrix(content)
+
+def worksheet_matrix(content: bytes | mmap) -> NDArray[np.uint8]:
+    chars = np.frombuffer(content, dtype=np.uint8)
+    size = len(chars) - (content[-1:] == b"\n")
+    width = content.find(b"\n") if content.find(b"\n") >= 0 else len(chars)
+    height = (size + 1) // (width + 1)
+
+    # equally wide rows can be viewed in place, stepping over the newline that ends each row
+    if size == height * (width + 1) - 1 and np.all(chars[width:size:width + 1] == ord("\n")):
+        return as_strided(chars, shape=(height, width), strides=(width + 1, 1), writeable=False)
+
+    lines = [line.rstrip(b"\r") for line in bytes(content).splitlines() if line.strip()]
+    width = max(len(line) for line in lines)
+
+    return np.frombuffer(b"".join(line.ljust(width) for line in lines), dtype=np.uint8).reshape(len(lines), width)
+
+def combine_operands(
+    ops: NDArray[np.uint8],
+    blocks: NDArray[np.intp],
+    values: NDArray[np.int64],
+    lengths: NDArray[np.integer[Any]]
+) -> int:
+    counts = np.bincount(blocks, minlength=len(ops))
+
+    if np.any(counts == 0):
+        raise ValueError("cephalopod problem without any numbers")
+
+    firsts = np.cumsum(counts) - counts
+    longest = np.maximum.reduceat(lengths, firsts)
+    is_product = ops == ord("*")
+
+    # evaluate in int64 unless the digit counts say the result could overflow
+    fits = np.where(is_product, np.add.reduceat(lengths, firsts) <= 18, longest + np.log10(counts) < 18)
+    results = np.where(is_product, np.multiply.reduceat(values, firsts), np.add.reduceat(values, firsts))
+    total: int = sum(results[fits].tolist())
+
+    for block in np.flatnonzero(~fits):
+        operands = values[firsts[block]:firsts[block] + counts[block]].tolist()
+        total += prod(operands) if is_product[block] else sum(operands)
+
+    return total
+
+# roughly how many cells are evaluated at once, which bounds the size of the int64 intermediates
+SLICE_CELLS = 1 << 20
+
+def evaluate_blocks(matrix: NDArray[np.uint8], starts: NDArray[np.intp], ends: NDArray[np.intp]) -> tuple[int, int]:
+    cells, ops = matrix[:-1], matrix[-1]
+    is_digit = (cells >= ord("0")) & (cells <= ord("9"))
+    digits = np.where(is_digit, cells - ord("0"), 0).astype(np.uint8)
+
+    # rows are read left to right: a digit is worth 10 ** (digits after it in the same block)
+    after = np.pad(np.cumsum(is_digit[:, ::-1], axis=1, dtype=np.int32)[:, ::-1], ((0, 0), (0, 1)))
+    is_start = np.zeros(matrix.shape[1], dtype=np.bool_)
+    is_start[starts] = True
+    block_of_column = np.maximum(np.cumsum(is_start) - 1, 0)
+    row_lengths = after[:, starts] - after[:, ends]
+
+    # columns are read top to bottom: a digit is worth 10 ** (digits below it)
+    below = np.cumsum(is_digit[::-1], axis=0, dtype=np.int32)[::-1] - is_digit
+    column_lengths = is_digit.sum(axis=0, dtype=np.int32)
+
+    if row_lengths.max(initial=0) > 18 or column_lengths.max(initial=0) > 18:
+        return solve_worksheet([row.tobytes().decode() for row in matrix])
+
+    exponents = np.where(is_digit, after[:, :-1] - after[:, ends[block_of_column]] - 1, 0).astype(np.int8)
+    row_values = np.add.reduceat(digits * POWERS_OF_TEN[exponents], starts, axis=1)
+    column_values = (digits * POWERS_OF_TEN[below.astype(np.int8)]).sum(axis=0)
+
+    rows = (row_lengths > 0).T
+    columns = column_lengths > 0
+
+    return (
+        combine_operands(
+            ops[starts],
+            np.nonzero(rows)[0],
+            row_values.T[rows],
+            row_lengths.T[rows]
+        ),
+        combine_operands(
+            ops[starts],
+            block_of_column[columns],
+            column_values[columns],
+            column_lengths[columns]
+        )
+    )
+
+def evaluate_worksheet(matrix: NDArray[np.uint8]) -> tuple[int, int]:
+    height, width = matrix.shape
+    step = max(1, SLICE_CELLS // max(height, 1))
+    blank = np.ones(width, dtype=np.bool_)
+
+    for first in range(0, width, step):
+        blank[first:first + step] = np.all(matrix[:, first:first + step] == ord(" "), axis=0)
+
+    starts = np.flatnonzero(~blank & np.append(True, blank[:-1]))
+    ends = np.flatnonzero(~blank & np.append(blank[1:], True)) + 1
+    ops = matrix[-1, starts] if height else starts
+
+    if not np.all((ops == ord("*")) | (ops == ord("+"))):
+        raise ValueError("invalid cephalopod operator")
+
+    ltr, rtl, first = 0, 0, 0
+
+    # evaluate whole blocks a slice of columns at a time and only keep the running totals
+    while first < len(starts):
+        last = max(first + 1, int(np.searchsorted(ends, starts[first] + step, side="right")))
+        offset = starts[first]
+        slice_ltr, slice_rtl = evaluate_blocks(
+            matrix[:, offset:ends[last - 1]],
+            starts[first:last] - offset,
+            ends[first:last] - offset
+        )
+        ltr, rtl, first = ltr + slice_ltr, rtl + slice_rtl, last
+
+    return ltr, rtl
 
 def main() -> int:
-    lines = [line for line in stdin if line.strip()]
+    ltr, rtl = evaluate_worksheet(load_worksheet(stdin.buffer))
 
-    print(sum(answer for answer in solve_homework(lines)))
-    print(sum(answer for answer in solve_homework(lines, rtl=True)))
+    print(ltr)
+    print(rtl)
 
     return 0
 
@@ -62,3 +210,13 @@ class Test:
 
     def test_example_2(self, example_input: List[str]) -> None:
         assert sum(answer for answer in solve_homework(example_input, rtl=True)) == 3263827
+
+    def test_parse_worksheet(self, example_input: List[str]) -> None:
+        assert next(parse_worksheet(example_input)) == Problem("*", [123, 45, 6], [1, 24, 356])
+        assert solve_worksheet(example_input) == (4277556, 3263827)
+
+    def test_evaluate_worksheet(self, example_input: List[str]) -> None:
+        assert evaluate_worksheet(worksheet_matrix("\n".join(example_input).encode())) == (4277556, 3263827)
+
+        ragged = [line.rstrip() for line in example_input[1:]]
+        assert evaluate_worksheet(worksheet_matrix("\n".join(ragged).encode())) == solve_worksheet(ragged)
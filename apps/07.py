@@ -1,35 +1,107 @@
-from functools import cache
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from heapq import heappop, heappush
 from sys import exit, stdin
-from typing import Dict, List
+from typing import Any, Dict, List
+
+import numpy as np
+from numpy.typing import NDArray
 
 def starting_point(line: str) -> int:
     return line.index('S')
 
-def tachyon_sim(lines: List[str], initial_beam: int, trace_path: bool = False) -> int:
-    so_far: Dict[tuple[int, int], int] = {}
+def parse_splitters(lines: List[str]) -> NDArray[np.bool_]:
+    width = max((len(line) for line in lines), default=0)
+    content = "".join(line.ljust(width, ".") for line in lines).encode()
+    splitters: NDArray[np.bool_] = np.frombuffer(content, dtype=np.uint8) == ord("^")
+
+    return splitters.reshape(len(lines), width)
+
+def sweep_manifold(lines: List[str], initial_beam: int) -> tuple[int, int]:
+    splitters = parse_splitters(lines)
+    timelines: NDArray[Any] = np.zeros(splitters.shape[1], dtype=np.int64)
+    timelines[initial_beam] = 1
+    splits, escaped = 0, 0
+
+    for row in np.flatnonzero(splitters.any(axis=1)):
+        # a row can at most triple the largest count, so switch to exact integers before int64 overflows
+        if timelines.dtype != object and timelines.max() >= 1 << 61:
+            timelines = timelines.astype(object)
+
+        hits = np.where(splitters[row], timelines, 0)
+        splits += int(np.count_nonzero(hits))
+
+        timelines = timelines - hits
+        timelines[1:] += hits[:-1]
+        timelines[:-1] += hits[1:]
+        escaped += int(hits[0]) + int(hits[-1])
+
+    return splits, sum(timelines.tolist()) + escaped
+
+@dataclass(frozen=True, slots=True)
+class SplitterIndex:
+    width: int
+    columns: Dict[int, List[int]]
+
+    @staticmethod
+    def from_lines(lines: List[str]) -> 'SplitterIndex':
+        columns = defaultdict[int, List[int]](list)
+
+        for row, line in enumerate(lines):
+            column = line.find("^")
+
+            while column >= 0:
+                columns[column].append(row)
+                column = line.find("^", column + 1)
+
+        return SplitterIndex(max((len(line) for line in lines), default=0), dict(columns))
 
-    def tachyon_step(row: int, beam: int) -> int:
-        if row == len(lines):
-            return 1 if trace_path else 0
-        elif (row, beam) in so_far:
-            return so_far[(row, beam)] if trace_path else 0
+    def next_splitter(self, row: int, column: int) -> int | None:
+        rows = self.columns.get(column, [])
+        i = bisect_left(rows, row)
 
-        match lines[row][beam]:
-            case '^':
-                result = tachyon_step(row + 1, beam - 1) + tachyon_step(row + 1, beam + 1) + (0 if trace_path else 1)
-            case _:
-                result = tachyon_step(row + 1, beam)
+        return rows[i] if i < len(rows) else None
 
-        so_far[(row, beam)] = result
-        return result
+def trace_splitters(index: SplitterIndex, initial_beam: int) -> tuple[int, int]:
+    timelines: Dict[tuple[int, int], int] = {}
+    pending: List[tuple[int, int]] = []
+    finished = 0
 
-    return tachyon_step(0, initial_beam)
+    def send(row: int, column: int, count: int) -> None:
+        nonlocal finished
+
+        if 0 <= column < index.width and (splitter := index.next_splitter(row, column)) is not None:
+            if (splitter, column) not in timelines:
+                timelines[(splitter, column)] = 0
+                heappush(pending, (splitter, column))
+
+            timelines[(splitter, column)] += count
+        else:
+            finished += count
+
+    send(0, initial_beam, 1)
+
+    # every beam into a splitter comes from a row above it, so visiting splitters in row
+    # order sees all of their incoming timelines before passing them on
+    while pending:
+        row, column = heappop(pending)
+        send(row + 1, column - 1, timelines[(row, column)])
+        send(row + 1, column + 1, timelines[(row, column)])
+
+    return len(timelines), finished
+
+def tachyon_sim(lines: List[str], initial_beam: int, trace_path: bool = False) -> int:
+    splits, timelines = sweep_manifold(lines, initial_beam)
+
+    return timelines if trace_path else splits
 
 def main() -> int:
     lines = [line.strip() for line in stdin if line.strip()]
+    splits, timelines = trace_splitters(SplitterIndex.from_lines(lines[1:]), starting_point(lines[0]))
 
-    print(tachyon_sim(lines[1:], starting_point(lines[0])))
-    print(tachyon_sim(lines[1:], starting_point(lines[0]), trace_path=True))
+    print(splits)
+    print(timelines)
 
     return 0
 
@@ -69,3 +141,18 @@ class Test:
 
     def test_example_2(self, example_input: List[str]) -> None:
         assert tachyon_sim(example_input[1:], starting_point(example_input[0]), trace_path=True) == 40
+
+    def test_sweep_manifold(self) -> None:
+        tall = ["...", ".^.", "..."] * 2000
+
+        assert sweep_manifold(tall, 1) == (1, 2)
+        assert sweep_manifold(["..^..", ".^.^."] * 40, 2) == (120, 3298534883326)
+        assert sweep_manifold([".^.^.", "^.^.^"] * 50, 2) == (246, 717897987691852588770248)
+
+    def test_trace_splitters(self, example_input: List[str]) -> None:
+        index = SplitterIndex.from_lines(example_input[1:])
+
+        assert index.next_splitter(3, 7) == 5
+        assert index.next_splitter(14, 7) is None
+        assert trace_splitters(index, starting_point(example_input[0])) == (21, 40)
+        assert trace_splitters(SplitterIndex.from_lines([".^.^.", "^.^.^"] * 50), 2) == (246, 717897987691852588770248)
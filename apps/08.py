@@ -1,11 +1,17 @@
 from array import array
 from dataclasses import dataclass
 from sys import exit, stdin
-from typing import List, TextIO, Tuple
+from typing import Generator, Iterable, Iterator, List, TextIO, Tuple
 from math import prod
 from io import StringIO
 from heapq import nsmallest, nlargest, heapify, heappop
-from itertools import combinations
+from itertools import combinations, islice, product
+from collections import defaultdict
+
+import numpy as np
+from numpy.typing import NDArray
+
+type Edge = Tuple[int, int, int]
 
 @dataclass(frozen=True, slots=True)
 class JunctionBox:
@@ -16,12 +22,144 @@ class JunctionBox:
 def parse_junction_boxes(lines: TextIO) -> List[JunctionBox]:
     return [JunctionBox(*map(int, line.strip().split(","))) for line in lines if line.strip()]
 
-def build_every_edge(boxes: List[JunctionBox]) -> List[Tuple[int, int, int]]:
+def squared_distance(a: JunctionBox, b: JunctionBox) -> int:
+    return (a.x - b.x) ** 2 + (a.y - b.y) ** 2 + (a.z - b.z) ** 2
+
+def build_every_edge(boxes: List[JunctionBox]) -> List[Edge]:
     return [
-        ((boxes[i].x - boxes[j].x) ** 2 + (boxes[i].y - boxes[j].y) ** 2 + (boxes[i].z - boxes[j].z) ** 2, i, j)
+        (squared_distance(boxes[i], boxes[j]), i, j)
         for i, j in combinations(range(len(boxes)), 2)
     ]
 
+def nearest_edges(boxes: List[JunctionBox]) -> Generator[Edge, None, None]:
+    if len(boxes) < 2:
+        return
+
+    spans = [max(axis) - min(axis) for axis in zip(*((box.x, box.y, box.z) for box in boxes))]
+    longest = sum(span ** 2 for span in spans)
+    forward = [offset for offset in product((-1, 0, 1), repeat=3) if offset > (0, 0, 0)]
+
+    # start with cells holding about one box each and double them every round; all edges no
+    # longer than a cell are found between neighbouring cells, so each round emits the edges
+    # longer than the previous cell size in sorted order
+    cell_size = max(1, int((prod(span + 1 for span in spans) / len(boxes)) ** (1 / 3)))
+    emitted = -1
+
+    while emitted < longest:
+        limit = cell_size ** 2
+        cells = defaultdict[tuple[int, int, int], List[int]](list)
+
+        for i, box in enumerate(boxes):
+            cells[(box.x // cell_size, box.y // cell_size, box.z // cell_size)].append(i)
+
+        batch: List[Edge] = []
+
+        for (x, y, z), members in cells.items():
+            for i, j in combinations(members, 2):
+                if emitted < (distance := squared_distance(boxes[i], boxes[j])) <= limit:
+                    batch.append((distance, i, j))
+
+            for dx, dy, dz in forward:
+                for i in members:
+                    for j in cells.get((x + dx, y + dy, z + dz), []):
+                        if emitted < (distance := squared_distance(boxes[i], boxes[j])) <= limit:
+                            batch.append((distance, min(i, j), max(i, j)))
+
+        batch.sort()
+        yield from batch
+
+        emitted, cell_size = limit, cell_size * 2
+
+@dataclass(frozen=True, slots=True)
+class EdgeArrays:
+    distances: NDArray[np.int64]
+    first: NDArray[np.int64]
+    second: NDArray[np.int64]
+
+    def __len__(self) -> int:
+        return len(self.distances)
+
+    def __iter__(self) -> Iterator[Edge]:
+        return zip(self.distances.tolist(), self.first.tolist(), self.second.tolist())
+
+def junction_box_array(boxes: List[JunctionBox]) -> NDArray[np.int64]:
+    return np.array([(box.x, box.y, box.z) for box in boxes], dtype=np.int64).reshape(-1, 3)
+
+def closest_edges(positions: NDArray[np.int64], k: int, block_elements: int = 1 << 22) -> EdgeArrays:
+    n = len(positions)
+    rows = max(1, block_elements // max(n, 1))
+
+    distances = first = second = np.empty(0, dtype=np.int64)
+    threshold = np.iinfo(np.int64).max
+
+    for start in range(0, n - 1, rows):
+        block = positions[start:start + rows]
+        others = positions[start + 1:]
+
+        # squared distances from every row of the block to every later box, one axis at a time
+        # so no (rows, n, 3) temporary is ever built
+        d = np.zeros((len(block), len(others)), dtype=np.int64)
+        for axis in range(3):
+            d += (block[:, axis, None] - others[None, :, axis]) ** 2
+
+        i, j = np.nonzero((np.arange(len(others)) >= np.arange(len(block))[:, None]) & (d <= threshold))
+
+        distances = np.concatenate((distances, d[i, j]))
+        first = np.concatenate((first, i + start))
+        second = np.concatenate((second, j + start + 1))
+
+        # keep everything tied with the k-th distance so the final order can break ties by index
+        if len(distances) > k > 0:
+            threshold = int(distances[np.argpartition(distances, k - 1)[k - 1]])
+            keep = distances <= threshold
+            distances, first, second = distances[keep], first[keep], second[keep]
+
+    order = np.lexsort((second, first, distances))[:k]
+
+    return EdgeArrays(distances[order], first[order], second[order])
+
+def minimum_spanning_tree(positions: NDArray[np.int64]) -> EdgeArrays:
+    n = len(positions)
+    outside = np.arange(1, max(n, 1), dtype=np.int64)
+    distances, first, second = (np.empty(len(outside), dtype=np.int64) for _ in range(3))
+
+    # Prim over the implicit complete graph: the first `size` slots hold the boxes outside the
+    # tree with their distance to it, and each newly attached box is swapped out past the end
+    axes = [np.ascontiguousarray(positions[1:, axis]) for axis in range(3)]
+    best = np.full(len(outside), np.iinfo(np.int64).max, dtype=np.int64)
+    nearest = np.zeros(len(outside), dtype=np.int64)
+    current = 0
+
+    # ties are broken by the edge's (lower, higher) box pair, encoded as lower * n + higher, so
+    # the tree is the one Kruskal over (distance, i, j) order builds
+    pairs = np.full(len(outside), np.iinfo(np.int64).max, dtype=np.int64)
+
+    for step, size in enumerate(range(len(outside), 0, -1)):
+        x, y, z = positions[current].tolist()
+        d = (axes[0][:size] - x) ** 2 + (axes[1][:size] - y) ** 2 + (axes[2][:size] - z) ** 2
+        closer = d < best[:size]
+
+        if len(ties := np.flatnonzero(d == best[:size])):
+            closer[ties] = (np.minimum(outside[ties], current) * n + np.maximum(outside[ties], current)) < pairs[ties]
+
+        moved = np.flatnonzero(closer)
+        best[moved], nearest[moved] = d[moved], current
+        pairs[moved] = np.minimum(outside[moved], current) * n + np.maximum(outside[moved], current)
+
+        tied = np.flatnonzero(best[:size] == best[int(np.argmin(best[:size]))])
+        slot = int(tied[np.argmin(pairs[tied])])
+        current = int(outside[slot])
+        distances[step] = best[slot]
+        first[step], second[step] = sorted((int(nearest[slot]), current))
+
+        last = size - 1
+        for column in (*axes, outside, best, nearest, pairs):
+            column[slot] = column[last]
+
+    order = np.lexsort((second, first, distances))
+
+    return EdgeArrays(distances[order], first[order], second[order])
+
 def merge_sets(parents: array[int], sizes: array[int], a: int, b: int) -> int | None:
     def find_set_root(x: int) -> int:
         while x != parents[x]:
@@ -41,7 +179,7 @@ def merge_sets(parents: array[int], sizes: array[int], a: int, b: int) -> int |
     return root_a
 
 def largest_clusters(
-    edges: List[Tuple[int, int, int]],
+    edges: Iterable[Edge],
     n: int,
     k: int = 3
 ) -> List[int]:
@@ -53,17 +191,21 @@ def largest_clusters(
     return nlargest(k, [sz for i, sz in enumerate(sizes) if parents[i] == i])
 
 def min_k_cluster(
-    edges: List[Tuple[int, int, int]],
+    edges: Iterable[Edge],
     n: int,
-    k: int = 1000
+    k: int = 1000,
+    presorted: bool = False
 ) -> Tuple[int, int]:
     parents, sizes = array('i', range(n)), array('i', [1] * n)
 
-    heapify(edges)
-    while edges:
-        _, a, b = heappop(edges)
+    # unless the caller promises ascending order, pop the edges off a heap of its own
+    if not presorted:
+        heap = list(edges)
+        heapify(heap)
+        edges = (heappop(heap) for _ in range(len(heap)))
 
-        if root := merge_sets(parents, sizes, a, b):
+    for _, a, b in edges:
+        if (root := merge_sets(parents, sizes, a, b)) is not None:
             if sizes[root] >= k:
                 return a, b
 
@@ -71,10 +213,10 @@ def min_k_cluster(
 
 def main() -> int:
     junction_boxes = list(parse_junction_boxes(stdin))
-    edges, n = build_every_edge(junction_boxes), len(junction_boxes)
+    n = len(junction_boxes)
 
-    print(prod(largest_clusters(nsmallest(1000, edges), n)))
-    print(prod(junction_boxes[i].x for i in min_k_cluster(edges, n, k=n)))
+    print(prod(largest_clusters(closest_edges(junction_box_array(junction_boxes), 1000), n)))
+    print(prod(junction_boxes[i].x for i in min_k_cluster(minimum_spanning_tree(junction_box_array(junction_boxes)), n, k=n, presorted=True)))
 
     return 0
 
@@ -122,3 +264,35 @@ class Test:
         edges, n = build_every_edge(junction_boxes), len(junction_boxes)
 
         assert prod(junction_boxes[i].x for i in min_k_cluster(edges, n, k=n)) == 25272
+        assert prod(junction_boxes[i].x for i in min_k_cluster(iter(edges[::-1]), n, k=n)) == 25272
+
+    def test_nearest_edges(self, junction_boxes: List[JunctionBox]) -> None:
+        n = len(junction_boxes)
+
+        assert list(nearest_edges(junction_boxes)) == sorted(build_every_edge(junction_boxes))
+        assert prod(largest_clusters(islice(nearest_edges(junction_boxes), 10), n)) == 40
+        assert prod(junction_boxes[i].x for i in min_k_cluster(nearest_edges(junction_boxes), n, k=n, presorted=True)) == 25272
+
+    def test_closest_edges(self, junction_boxes: List[JunctionBox]) -> None:
+        positions, n = junction_box_array(junction_boxes), len(junction_boxes)
+        edges = sorted(build_every_edge(junction_boxes))
+
+        assert list(closest_edges(positions, 10)) == edges[:10]
+        assert list(closest_edges(positions, 10, block_elements=1)) == edges[:10]
+        assert list(closest_edges(positions, len(edges) + 1)) == edges
+        assert prod(largest_clusters(closest_edges(positions, 10), n)) == 40
+
+    def test_minimum_spanning_tree(self, junction_boxes: List[JunctionBox]) -> None:
+        tree, n = minimum_spanning_tree(junction_box_array(junction_boxes)), len(junction_boxes)
+
+        assert len(tree) == n - 1
+        assert list(tree) == sorted(tree)
+        assert prod(junction_boxes[i].x for i in min_k_cluster(tree, n, k=n, presorted=True)) == 25272
+
+    def test_minimum_spanning_tree_ties(self) -> None:
+        # a small grid where most distances are tied, so only the (distance, i, j) order decides
+        boxes = [JunctionBox(x, y, z) for z in range(2) for y in range(3) for x in range(1, 4)][::-1]
+        tree, n = minimum_spanning_tree(junction_box_array(boxes)), len(boxes)
+
+        for k in range(2, n + 1):
+            assert min_k_cluster(tree, n, k=k, presorted=True) == min_k_cluster(build_every_edge(boxes), n, k=k)
@@ -1,19 +1,85 @@
 from sys import exit, stdin
-from typing import List, TextIO, Tuple
-from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generator, List, TextIO, Tuple
+from dataclasses import dataclass, field
 from itertools import combinations
 from io import StringIO
 from bisect import bisect_left, bisect_right
-from functools import cache
+from heapq import heapify, heappop, heappush
+from collections import OrderedDict, deque
+
+import numpy as np
+from numpy.typing import NDArray
 
 type Tile = Tuple[int, int]
+type Border = Tuple[Tile, Tile]
+type QueryKey = Tuple[int, int, int]
+
+@dataclass
+class BorderQueries:
+    # indexed by axis: the borders to scan along it and their sorted starting coordinates
+    lines: Tuple[Tuple[Border, ...], Tuple[Border, ...]]
+    starts: Tuple[List[int], List[int]]
+    max_entries: int = 1 << 16
+    inside: OrderedDict[QueryKey, bool] = field(default_factory=OrderedDict)
+    on_edge: OrderedDict[QueryKey, bool] = field(default_factory=OrderedDict)
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @staticmethod
+    def from_lines(
+        vertical_lines: Tuple[Border, ...],
+        horizontal_lines: Tuple[Border, ...],
+        max_entries: int = 1 << 16
+    ) -> 'BorderQueries':
+        return BorderQueries(
+            lines=(vertical_lines, horizontal_lines),
+            starts=([one[0] for one, _ in vertical_lines], [one[1] for one, _ in horizontal_lines]),
+            max_entries=max_entries,
+        )
+
+    def lookup(self, cache: OrderedDict[QueryKey, bool], key: QueryKey, compute: Callable[[], bool]) -> bool:
+        if (value := cache.get(key)) is not None:
+            cache.move_to_end(key)
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        cache[key] = value = compute()
+
+        if len(cache) > self.max_entries:
+            cache.popitem(last=False)
+            self.evictions += 1
+
+        return value
+
+    def point_inside(self, axis: int, x: int, y: int) -> bool:
+        return self.lookup(
+            self.inside,
+            (axis, x, y),
+            lambda: point_inside_polygon_1d(self.lines[axis], self.starts[axis], axis, x, y)
+        )
+
+    def point_on_edge(self, axis: int, x: int, y: int) -> bool:
+        return self.lookup(
+            self.on_edge,
+            (axis, x, y),
+            lambda: point_on_edge_1d(self.lines[axis], self.starts[axis], axis, x, y)
+        )
 
 @dataclass(frozen=True, slots=True)
 class Borders:
-    horizontal_lines: Tuple[Tuple[Tile, Tile], ...]
-    horizontal_edges: Tuple[Tuple[Tile, Tile], ...]
-    vertical_lines: Tuple[Tuple[Tile, Tile], ...]
-    vertical_edges: Tuple[Tuple[Tile, Tile], ...]
+    horizontal_lines: Tuple[Border, ...]
+    horizontal_edges: Tuple[Border, ...]
+    vertical_lines: Tuple[Border, ...]
+    vertical_edges: Tuple[Border, ...]
+    cache_size: int = field(default=1 << 16, compare=False)
+    queries: BorderQueries = field(init=False, compare=False, repr=False)
+
+    # the queries only hold the border tuples, not the Borders, so they go away with it
+    def __post_init__(self) -> None:
+        queries = BorderQueries.from_lines(self.vertical_lines, self.horizontal_lines, self.cache_size)
+        object.__setattr__(self, "queries", queries)
 
 def parse_tile(line: str) -> Tile:
     x_str, y_str = line.strip().split(",")
@@ -22,7 +88,7 @@ def parse_tile(line: str) -> Tile:
 def parse_tiles(content: TextIO) -> List[Tile]:
     return [parse_tile(line) for line in content if line.strip()]
 
-def build_green_borders(tiles: List[Tile]) -> Borders:
+def build_green_borders(tiles: List[Tile], cache_size: int = 1 << 16) -> Borders:
     borders = [(a, b) for a, b in zip(tiles, tiles[1:] + [tiles[0]])]
     horizontal = [(a, b) if a[0] < b[0] else (b, a) for a, b in borders if a[1] == b[1]]
     vertical = [(a, b) if a[1] < b[1] else (b, a) for a, b in borders if a[0] == b[0]]
@@ -32,6 +98,7 @@ def build_green_borders(tiles: List[Tile]) -> Borders:
         horizontal_edges=tuple(sorted(horizontal, key=lambda border: border[0][0])),
         vertical_lines=tuple(sorted(vertical, key=lambda border: border[0][0])),
         vertical_edges=tuple(sorted(vertical, key=lambda border: border[0][1])),
+        cache_size=cache_size,
     )
 
 def rectangle_area(a: Tile, b: Tile) -> int:
@@ -44,14 +111,77 @@ def build_every_rectangle(tiles: List[Tile]) -> List[Tuple[Tile, Tile]]:
         reverse=True
     )
 
-@cache
+def largest_rectangles(
+    tiles: List[Tile],
+    batch_size: int = 32,
+    prune: bool = True
+) -> Generator[Tuple[Tile, Tile], None, None]:
+    n = len(tiles)
+    if n < 2:
+        return
+
+    xs = np.array([x for x, _ in tiles], dtype=np.int64)
+    ys = np.array([y for _, y in tiles], dtype=np.int64)
+    min_x, max_x, min_y, max_y = int(xs.min()), int(xs.max()), int(ys.min()), int(ys.max())
+
+    # every partner lies in the bounding box, so the farthest corner bounds an anchor's areas
+    def area_bound(x: int, y: int) -> int:
+        if not prune:
+            return (max_x - min_x + 1) * (max_y - min_y + 1)
+        return (max(x - min_x, max_x - x) + 1) * (max(y - min_y, max_y - y) + 1)
+
+    # each anchor pairs with the later tiles only; cursors hold the last (area, partner) handed
+    # out, and the next batch continues strictly after it in (-area, partner) order
+    cursors = [(area_bound(x, y) + 1, -1) for x, y in tiles]
+    pending = [deque[Tuple[int, int]]() for _ in range(n)]
+    exhausted = [False] * n
+
+    def expand(i: int) -> None:
+        last_area, last_j = cursors[i]
+        partners = np.arange(i + 1, n)
+        areas = (np.abs(xs[i + 1:] - xs[i]) + 1) * (np.abs(ys[i + 1:] - ys[i]) + 1)
+
+        keep = (areas < last_area) | ((areas == last_area) & (partners > last_j))
+        areas, partners = areas[keep], partners[keep]
+
+        if len(areas) > batch_size:
+            keep = areas >= np.partition(areas, len(areas) - batch_size)[len(areas) - batch_size]
+            areas, partners = areas[keep], partners[keep]
+
+        order = np.lexsort((partners, -areas))[:batch_size]
+        pending[i].extend(zip(areas[order].tolist(), partners[order].tolist()))
+
+        if pending[i]:
+            cursors[i] = pending[i][-1]
+        exhausted[i] = len(order) < batch_size
+
+    # heap entries are (-area, anchor, partner); a partner of -1 stands for the unexpanded rest
+    # of an anchor, keyed by an upper bound on its areas
+    heap = [(-cursors[i][0] + 1, i, -1) for i in range(n - 1)]
+    heapify(heap)
+
+    while heap:
+        _, i, j = heappop(heap)
+
+        if j < 0:
+            expand(i)
+        else:
+            yield tiles[i], tiles[j]
+
+        if pending[i]:
+            area, j = pending[i].popleft()
+            heappush(heap, (-area, i, j))
+        elif not exhausted[i]:
+            heappush(heap, (-cursors[i][0], i, -1))
+
 def point_inside_polygon_1d(
-    borders: Tuple[Tuple[Tile, Tile], ...],
+    borders: Tuple[Border, ...],
+    starts: List[int],
     x_index: int,
     x: int,
     y: int
 ) -> bool:
-    upper = bisect_right(borders, x, key=lambda border: border[0][x_index])
+    upper = bisect_right(starts, x)
     y_index = 1 - x_index
     inside = False
 
@@ -65,15 +195,14 @@ def point_inside_polygon_1d(
 
     return inside
 
-@cache
 def point_on_edge_1d(
-    borders: Tuple[Tuple[Tile, Tile], ...],
+    borders: Tuple[Border, ...],
+    starts: List[int],
     x_index: int,
     x: int,
     y: int,
 ) -> bool:
-    lower = bisect_left(borders, x, key=lambda border: border[0][x_index])
-    upper = bisect_right(borders, x, key=lambda border: border[0][x_index])
+    lower, upper = bisect_left(starts, x), bisect_right(starts, x)
     y_index = 1 - x_index
 
     return any(one[y_index] <= y <= two[y_index] for one, two in borders[lower:upper])
@@ -89,8 +218,8 @@ def line_inside_polygon(
         upper = bisect_right(borders.horizontal_edges, ax, key=lambda border: border[0][0])
 
         return all(
-            point_inside_polygon_1d(borders.horizontal_lines, 1, y, ax)
-            or point_on_edge_1d(borders.vertical_lines, 0, ax, y)
+            borders.queries.point_inside(1, y, ax)
+            or borders.queries.point_on_edge(0, ax, y)
             for one, two in borders.horizontal_edges[:upper]
             for y in [one[1] - 1, one[1] + 1]
             if one[0] <= ax <= two[0] and (ay <= y <= by)
@@ -99,8 +228,8 @@ def line_inside_polygon(
         upper = bisect_right(borders.vertical_edges, ay, key=lambda border: border[0][1])
 
         return all(
-            point_inside_polygon_1d(borders.vertical_lines, 0, x, ay)
-            or point_on_edge_1d(borders.horizontal_lines, 1, ay, x)
+            borders.queries.point_inside(0, x, ay)
+            or borders.queries.point_on_edge(1, ay, x)
             for one, two in borders.vertical_edges[:upper]
             for x in [one[0] - 1, one[0] + 1]
             if one[1] <= ay <= two[1] and ax <= x <= bx
@@ -126,12 +255,70 @@ def rectangle_inside(
         return False
     return True
 
+@dataclass(frozen=True, slots=True)
+class PolygonGrid:
+    x_indices: Dict[int, int]
+    y_indices: Dict[int, int]
+    outside: NDArray[np.signedinteger[Any]]
+
+    # compressed cell 2k covers vertex coordinate k, cell 2k + 1 the tiles strictly between
+    # coordinates k and k + 1; outside holds the 2D prefix sum of cells outside the polygon
+    @staticmethod
+    def from_tiles(tiles: List[Tile]) -> 'PolygonGrid':
+        xs, ys = sorted({x for x, _ in tiles}), sorted({y for _, y in tiles})
+        x_indices = {x: 2 * i for i, x in enumerate(xs)}
+        y_indices = {y: 2 * i for i, y in enumerate(ys)}
+        height, width = 2 * len(ys) - 1, 2 * len(xs) - 1
+
+        # horizontal edges are accumulated along rows and vertical ones along columns, so they
+        # get difference tables of their own; crossings toggles the vertical edges on odd rows
+        horizontal = np.zeros((height, width + 1), dtype=np.int8)
+        vertical = np.zeros((height + 1, width), dtype=np.int8)
+        crossings = np.zeros((height + 1, width), dtype=np.uint8)
+
+        for (ax, ay), (bx, by) in zip(tiles, tiles[1:] + tiles[:1]):
+            (left, right), (top, bottom) = sorted((x_indices[ax], x_indices[bx])), sorted((y_indices[ay], y_indices[by]))
+
+            if top == bottom:
+                np.add.at(horizontal, ([top, top], [left, right + 1]), [1, -1])
+            else:
+                np.add.at(vertical, ([top, bottom + 1], [left, left]), [1, -1])
+                np.bitwise_xor.at(crossings, ([top + 1, bottom], [left, left]), 1)
+
+        on_boundary = (
+            (horizontal.cumsum(axis=1, dtype=np.int8)[:, :width] > 0)
+            | (vertical.cumsum(axis=0, dtype=np.int8)[:height] > 0)
+        )
+
+        # odd rows take the parity of the vertical edges crossed to their left; a point on an even
+        # row that is not on the boundary shares its neighbourhood with the next odd row
+        inside = np.bitwise_xor.accumulate(np.bitwise_xor.accumulate(crossings, axis=0), axis=1)
+        inside[0:height:2] = inside[1:height + 1:2]
+        inside = inside[:height].astype(np.bool_) | on_boundary
+
+        # gaps between adjacent coordinates hold no tiles, so they can never rule a rectangle out
+        inside[:, 1::2] |= (np.diff(xs) == 1)[None, :]
+        inside[1::2, :] |= (np.diff(ys) == 1)[:, None]
+
+        dtype: type[np.signedinteger[Any]] = np.int32 if height * width < 2 ** 31 else np.int64
+        outside = np.zeros((height + 1, width + 1), dtype=dtype)
+        outside[1:, 1:] = (~inside).cumsum(axis=0, dtype=dtype).cumsum(axis=1, dtype=dtype)
+
+        return PolygonGrid(x_indices, y_indices, outside)
+
+    def rectangle_inside(self, a: Tile, b: Tile) -> bool:
+        left, right = sorted((self.x_indices[a[0]], self.x_indices[b[0]]))
+        top, bottom = sorted((self.y_indices[a[1]], self.y_indices[b[1]]))
+        outside = self.outside
+
+        return bool(outside[bottom + 1, right + 1] - outside[top, right + 1] - outside[bottom + 1, left] + outside[top, left] == 0)
+
 def main() -> int:
     tiles = parse_tiles(stdin)
-    rectangles, green_borders = build_every_rectangle(tiles), build_green_borders(tiles)
+    grid = PolygonGrid.from_tiles(tiles)
 
-    print(rectangle_area(*rectangles[0]))
-    print(next(rectangle_area(a, b) for a, b in rectangles if rectangle_inside(green_borders, a, b)))
+    print(rectangle_area(*next(largest_rectangles(tiles))))
+    print(next(rectangle_area(a, b) for a, b in largest_rectangles(tiles) if grid.rectangle_inside(a, b)))
 
     return 0
 
@@ -167,3 +354,28 @@ class Test:
         rectangles, green_borders = build_every_rectangle(tiles), build_green_borders(tiles)
 
         assert next(rectangle_area(a, b) for a, b in rectangles if rectangle_inside(green_borders, a, b)) == 24
+
+    def test_polygon_grid(self, tiles: List[Tile]) -> None:
+        rectangles, green_borders = build_every_rectangle(tiles), build_green_borders(tiles)
+        grid = PolygonGrid.from_tiles(tiles)
+
+        assert all(grid.rectangle_inside(a, b) == rectangle_inside(green_borders, a, b) for a, b in rectangles)
+        assert next(rectangle_area(a, b) for a, b in rectangles if grid.rectangle_inside(a, b)) == 24
+
+    def test_largest_rectangles(self, tiles: List[Tile]) -> None:
+        rectangles = build_every_rectangle(tiles)
+
+        assert list(largest_rectangles(tiles)) == rectangles
+        assert list(largest_rectangles(tiles, batch_size=2, prune=False)) == rectangles
+
+    def test_border_queries(self, tiles: List[Tile]) -> None:
+        rectangles = build_every_rectangle(tiles)
+        green_borders, small_borders = build_green_borders(tiles), build_green_borders(tiles, cache_size=2)
+
+        assert [rectangle_inside(green_borders, a, b) for a, b in rectangles] == \
+            [rectangle_inside(small_borders, a, b) for a, b in rectangles]
+
+        assert green_borders.queries.hits > 0 and green_borders.queries.evictions == 0
+        assert small_borders.queries.evictions > 0
+        assert len(small_borders.queries.inside) <= 2 and len(small_borders.queries.on_edge) <= 2
+        assert green_borders == small_borders
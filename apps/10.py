@@ -1,7 +1,18 @@
-from dataclasses import dataclass
-from sys import exit, stdin, maxsize
-from typing import List
+from argparse import ArgumentParser, ArgumentTypeError
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from hashlib import sha256
+from json import dumps
+from sqlite3 import Connection, connect
+from sys import exit, stdin, stderr, maxsize
+from typing import Any, Dict, Iterator, List, Tuple
 from re import fullmatch
+from functools import partial, reduce
+from operator import xor
+from fractions import Fraction
+from math import lcm
+from random import Random
+from time import perf_counter, time_ns
 
 @dataclass(frozen=True, slots=True)
 class Machine:
@@ -27,11 +38,84 @@ def parse_machine(line: str) -> Machine:
 
     return Machine(light_diagram, buttons, voltage_requirements)
 
-def minimum_button_presses(machine: Machine, voltage: bool = False) -> int:
-    from z3 import Int, Optimize, Sum, sat # type: ignore
+def button_masks(machine: Machine) -> List[int]:
+    return [reduce(xor, (1 << light for light in button), 0) for button in machine.buttons]
+
+def light_mask(machine: Machine) -> int:
+    return sum(1 << i for i, light in enumerate(machine.light_diagram) if light == "#")
+
+def solve_gf2(masks: List[int], target: int) -> Tuple[int, List[int]] | None:
+    # pivots maps a light to a reduced button combination (lights, presses) whose highest lit
+    # light it is; combinations that reduce to nothing span the null space
+    pivots: Dict[int, Tuple[int, int]] = {}
+    null_space = []
+
+    def eliminate(lights: int, presses: int) -> Tuple[int, int]:
+        while lights and (pivot := pivots.get(lights.bit_length() - 1)):
+            lights, presses = lights ^ pivot[0], presses ^ pivot[1]
+        return lights, presses
+
+    for i, mask in enumerate(masks):
+        lights, presses = eliminate(mask, 1 << i)
+
+        if lights:
+            pivots[lights.bit_length() - 1] = (lights, presses)
+        else:
+            null_space.append(presses)
+
+    lights, particular = eliminate(target, 0)
+
+    if lights:
+        return None
+    return particular, null_space
+
+def min_weight_by_null_space(particular: int, null_space: List[int]) -> int:
+    best = presses = particular
+
+    # walk every combination of the null space in Gray code order, one xor per step
+    for step in range(1, 1 << len(null_space)):
+        presses ^= null_space[(step & -step).bit_length() - 1]
+        best = min(best, presses, key=int.bit_count)
+
+    return best.bit_count()
+
+def min_weight_by_halves(masks: List[int], target: int) -> int:
+    def subset_lights(half: List[int]) -> Dict[int, int]:
+        fewest = {0: 0}
+        for mask in half:
+            for lights, presses in list(fewest.items()):
+                if presses + 1 < fewest.get(lights ^ mask, maxsize):
+                    fewest[lights ^ mask] = presses + 1
+        return fewest
+
+    middle = len(masks) // 2
+    left, right = subset_lights(masks[:middle]), subset_lights(masks[middle:])
+
+    return min(
+        (presses + left[lights ^ target] for lights, presses in right.items() if lights ^ target in left),
+        default=maxsize
+    )
+
+def minimum_light_presses(machine: Machine) -> int:
+    masks, target = button_masks(machine), light_mask(machine)
+
+    if (solution := solve_gf2(masks, target)) is None:
+        return maxsize
+
+    particular, null_space = solution
+
+    # the null space walk costs 2^nullity, meeting in the middle about 2^(buttons / 2) per half
+    if len(null_space) <= (len(masks) + 1) // 2 + 1:
+        return min_weight_by_null_space(particular, null_space)
+    return min_weight_by_halves(masks, target)
+
+def z3_button_presses(machine: Machine, timeout: float | None = None) -> int:
+    from z3 import Int, Optimize, Sum, sat, unknown # type: ignore
     from typing import Any
 
     solver = Optimize()
+    if timeout is not None:
+        solver.set("timeout", max(1, int(timeout * 1000)))
     button_exprs = [list[Any]() for _ in range(len(machine.voltage_requirements))]
     button_vars = [Int(f"button[{i}]") for i in range(len(machine.buttons))]
 
@@ -41,27 +125,337 @@ def minimum_button_presses(machine: Machine, voltage: bool = False) -> int:
 
         solver.add(button_var >= 0)
 
-    if voltage:
-        for i, voltage_requirement in enumerate(machine.voltage_requirements):
-            solver.add(Sum(button_exprs[i]) == voltage_requirement)
-    else:
-        for i, light in enumerate(machine.light_diagram):
-            if light == "#":
-                solver.add(Sum(button_exprs[i]) % 2 == 1)
-            else:
-                solver.add(Sum(button_exprs[i]) % 2 == 0)
+    for i, voltage_requirement in enumerate(machine.voltage_requirements):
+        solver.add(Sum(button_exprs[i]) == voltage_requirement)
 
     objective = solver.minimize(Sum(button_vars))
 
-    if solver.check() != sat:
+    if (result := solver.check()) == unknown:
+        raise TimeoutError(f"z3 gave up after {timeout}s")
+    if result != sat:
         return maxsize
     return solver.lower(objective).as_long() # type: ignore
 
+def native_button_presses(
+    machine: Machine,
+    search_limit: int = 1 << 18,
+    deadline: float | None = None
+) -> int | None:
+    targets = machine.voltage_requirements
+
+    # buttons raising the same counters are interchangeable, so only one of each is kept
+    effects = list(dict.fromkeys(tuple(counters.count(counter) for counter in range(len(targets))) for counters in machine.buttons))
+    counts = [list(row) for row in zip(*effects)] or [[] for _ in targets]
+    columns = len(effects)
+
+    # no button can be pressed more often than its tightest counter allows
+    bounds = [
+        min((target // row[button] for target, row in zip(targets, counts) if row[button]), default=0)
+        for button in range(columns)
+    ]
+
+    rows = [[Fraction(count) for count in row] + [Fraction(target)] for row, target in zip(counts, targets)]
+    pivots: List[int] = []
+
+    for column in range(columns):
+        if (found := next((i for i in range(len(pivots), len(rows)) if rows[i][column]), None)) is None:
+            continue
+
+        rank = len(pivots)
+        rows[rank], rows[found] = rows[found], rows[rank]
+        rows[rank] = [value / rows[rank][column] for value in rows[rank]]
+
+        for i, row in enumerate(rows):
+            if i != rank and row[column]:
+                rows[i] = [value - row[column] * pivot for value, pivot in zip(row, rows[rank])]
+
+        pivots.append(column)
+
+    if any(row[-1] for row in rows[len(pivots):]):
+        return maxsize
+
+    free = [column for column in range(columns) if column not in pivots]
+
+    # scale every pivot row to integers: scale * pivot = rhs - sum(coefficient * free variable)
+    scales = [lcm(*(value.denominator for value in row)) for row in rows[:len(pivots)]]
+    coefficients = [[int(row[column] * scale) for column in free] for row, scale in zip(rows, scales)]
+    rhs = [int(row[-1] * scale) for row, scale in zip(rows, scales)]
+    limits = [bounds[column] * scale for column, scale in zip(pivots, scales)]
+
+    # the total presses, scaled by a common multiple, are linear in the free variables
+    common = lcm(*scales)
+    base = sum(value * (common // scale) for value, scale in zip(rhs, scales))
+    weights = [
+        common - sum(row[k] * (common // scale) for row, scale in zip(coefficients, scales))
+        for k in range(len(free))
+    ]
+
+    # per depth, the lowest objective change and the range the remaining free variables can
+    # still take off each pivot row
+    optimistic, lowest, highest = [0], [[0] * len(pivots)], [[0] * len(pivots)]
+    for k in reversed(range(len(free))):
+        bound = bounds[free[k]]
+        optimistic.insert(0, optimistic[0] + min(0, weights[k] * bound))
+        lowest.insert(0, [low + min(0, row[k] * bound) for low, row in zip(lowest[0], coefficients)])
+        highest.insert(0, [high + max(0, row[k] * bound) for high, row in zip(highest[0], coefficients)])
+
+    best, budget = maxsize, search_limit
+
+    # returns False once the node budget runs out, leaving the machine to the z3 fallback
+    def search(k: int, residuals: List[int], scaled: int) -> bool:
+        nonlocal best, budget
+
+        if (budget := budget - 1) < 0:
+            return False
+        if deadline is not None and perf_counter() > deadline:
+            raise TimeoutError("native search ran past its deadline")
+
+        if k == len(free):
+            if all(
+                0 <= residual <= limit and residual % scale == 0
+                for residual, scale, limit in zip(residuals, scales, limits)
+            ):
+                best = min(best, scaled)
+            return True
+
+        # every pivot row has to stay within [0, limit] whatever the later free variables do,
+        # which narrows this variable to an interval
+        low, high = 0, bounds[free[k]]
+        for residual, row, rest_low, rest_high, limit in zip(residuals, coefficients, lowest[k + 1], highest[k + 1], limits):
+            if (coefficient := row[k]) > 0:
+                low = max(low, -((rest_high + limit - residual) // coefficient))
+                high = min(high, (residual - rest_low) // coefficient)
+            elif coefficient < 0:
+                low = max(low, -((residual - rest_low) // -coefficient))
+                high = min(high, (rest_high + limit - residual) // -coefficient)
+
+        presses = range(low, high + 1)
+        for value in presses if weights[k] >= 0 else reversed(presses):
+            if scaled + weights[k] * value + optimistic[k + 1] >= best:
+                break
+            if not search(k + 1, [residual - row[k] * value for residual, row in zip(residuals, coefficients)], scaled + weights[k] * value):
+                return False
+
+        return True
+
+    if not search(0, rhs, base):
+        return None
+    return maxsize if best == maxsize else best // common
+
+def minimum_button_presses(
+    machine: Machine,
+    voltage: bool = False,
+    search_limit: int = 1 << 18,
+    timeout: float | None = None
+) -> int:
+    if not voltage:
+        return minimum_light_presses(machine)
+
+    deadline = None if timeout is None else perf_counter() + timeout
+
+    if (presses := native_button_presses(machine, search_limit, deadline)) is not None:
+        return presses
+    return z3_button_presses(machine, None if deadline is None else deadline - perf_counter())
+
+def warm_solver() -> None:
+    import z3
+
+def solve_machine(machine: Machine, timeout: float | None = None) -> Tuple[int, int | None]:
+    try:
+        voltage_presses: int | None = minimum_button_presses(machine, voltage=True, timeout=timeout)
+    except TimeoutError:
+        voltage_presses = None
+
+    return minimum_button_presses(machine), voltage_presses
+
+def solve_machines(
+    machines: List[Machine],
+    jobs: int = 1,
+    timeout: float | None = None
+) -> Iterator[Tuple[int, int | None]]:
+    if jobs <= 1:
+        yield from (solve_machine(machine, timeout) for machine in machines)
+        return
+
+    # a few chunks per worker keeps the pipes quiet while still balancing uneven machines
+    with ProcessPoolExecutor(jobs, initializer=warm_solver) as executor:
+        yield from executor.map(
+            partial(solve_machine, timeout=timeout),
+            machines,
+            chunksize=max(1, len(machines) // (jobs * 4))
+        )
+
+def machine_key(machine: Machine, voltage: bool) -> str:
+    # duplicate buttons never lower the fewest presses in either mode, so they share a key
+    buttons = sorted({tuple(sorted(button)) for button in machine.buttons})
+    target: Any = machine.voltage_requirements if voltage else machine.light_diagram
+
+    return sha256(dumps(["voltage" if voltage else "lights", buttons, target]).encode()).hexdigest()
+
+@dataclass
+class SolutionCache:
+    connection: Connection
+    max_entries: int = 1 << 20
+    batch_size: int = 256
+    pending: List[Tuple[str, int, int]] = field(default_factory=list)
+    hits: int = 0
+    misses: int = 0
+
+    @staticmethod
+    def open(path: str, max_entries: int = 1 << 20) -> 'SolutionCache':
+        connection = connect(path)
+
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, presses INTEGER, last_used INTEGER)")
+            connection.execute("CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)")
+
+        return SolutionCache(connection, max_entries)
+
+    # looks up every key at once and marks the hits as used in a single transaction
+    def get_many(self, keys: List[str]) -> List[int | None]:
+        found = [self.connection.execute("SELECT presses FROM solutions WHERE key = ?", (key,)).fetchone() for key in keys]
+        used = time_ns()
+
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE solutions SET last_used = ? WHERE key = ?",
+                [(used, key) for key, row in zip(keys, found) if row is not None]
+            )
+
+        self.hits += sum(row is not None for row in found)
+        self.misses += sum(row is None for row in found)
+
+        return [None if row is None else int(row[0]) for row in found]
+
+    def get(self, key: str) -> int | None:
+        return self.get_many([key])[0]
+
+    # solutions are written out in batches, so an interrupted run keeps all but the last few
+    def put(self, key: str, presses: int) -> None:
+        self.pending.append((key, presses, time_ns()))
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)", self.pending)
+
+        self.pending.clear()
+
+    # writes out what is pending and drops the least recently used solutions beyond max_entries
+    def close(self) -> None:
+        self.flush()
+
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM solutions WHERE key IN "
+                "(SELECT key FROM solutions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+        self.connection.close()
+
+def solve_cached_machines(
+    machines: List[Machine],
+    cache: SolutionCache,
+    jobs: int = 1,
+    timeout: float | None = None
+) -> Iterator[Tuple[int, int | None]]:
+    keys = [(machine_key(machine, False), machine_key(machine, True)) for machine in machines]
+    found = cache.get_many([key for pair in keys for key in pair])
+    cached = list(zip(found[0::2], found[1::2]))
+
+    # only the machines missing either answer go to the solvers, still in input order
+    solved = solve_machines(
+        [machine for machine, (light, voltage) in zip(machines, cached) if light is None or voltage is None],
+        jobs,
+        timeout
+    )
+
+    for (light_key, voltage_key), (light, voltage) in zip(keys, cached):
+        if light is None or voltage is None:
+            light, voltage = next(solved)
+            cache.put(light_key, light)
+
+            if voltage is not None:
+                cache.put(voltage_key, voltage)
+
+        yield light, voltage
+
+    cache.flush()
+
+def generate_machines(count: int, seed: int = 0) -> List[Machine]:
+    rng = Random(seed)
+    machines = []
+
+    for _ in range(count):
+        counters = rng.randint(4, 10)
+        buttons = [
+            sorted(rng.sample(range(counters), rng.randint(1, counters)))
+            for _ in range(rng.randint(counters - 2, counters + 3))
+        ]
+        presses = [rng.randrange(20) for _ in buttons]
+        voltages = [sum(n for n, button in zip(presses, buttons) if counter in button) for counter in range(counters)]
+
+        machines.append(Machine("." * counters, buttons, voltages))
+
+    return machines
+
+def voltage_benchmark(count: int, seed: int = 0) -> Tuple[float, float]:
+    machines = generate_machines(count, seed)
+    timings = []
+
+    for solve in (lambda machine: minimum_button_presses(machine, voltage=True), z3_button_presses):
+        started = perf_counter()
+        for machine in machines:
+            solve(machine)
+        timings.append(perf_counter() - started)
+
+    return timings[0], timings[1]
+
+def positive_int(value: str) -> int:
+    if (number := int(value)) < 1:
+        raise ArgumentTypeError(f"{value} is not a positive number")
+    return number
+
 def main() -> int:
+    parser = ArgumentParser()
+    parser.add_argument("--benchmark", type=int, metavar="N", help="solve N generated machines with both voltage solvers")
+    parser.add_argument("--jobs", type=positive_int, default=1, metavar="N", help="solve machines in N worker processes")
+    parser.add_argument("--timeout", type=float, metavar="SECONDS", help="give up on a machine's voltages after SECONDS")
+    parser.add_argument("--cache", metavar="PATH", help="reuse solutions stored in the sqlite database at PATH")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        native, z3 = voltage_benchmark(args.benchmark)
+        print(f"{args.benchmark} machines in {native:.2f}s native, {z3:.2f}s z3")
+        return 0
+
     machines = [parse_machine(line.strip()) for line in stdin if line.strip()]
 
-    print(sum(minimum_button_presses(machine) for machine in machines))
-    print(sum(minimum_button_presses(machine, voltage=True) for machine in machines))
+    cache = None if args.cache is None else SolutionCache.open(args.cache)
+    light_total = voltage_total = 0
+
+    if cache is None:
+        solutions = solve_machines(machines, args.jobs, args.timeout)
+    else:
+        solutions = solve_cached_machines(machines, cache, args.jobs, args.timeout)
+
+    try:
+        for i, (light_presses, voltage_presses) in enumerate(solutions):
+            light_total += light_presses
+
+            if voltage_presses is None:
+                print(f"machine {i + 1} timed out after {args.timeout}s", file=stderr)
+            else:
+                voltage_total += voltage_presses
+    finally:
+        if cache is not None:
+            cache.close()
+
+    print(light_total)
+    print(voltage_total)
 
     return 0
 
@@ -70,7 +464,8 @@ if __name__ == "__main__":
 
 # -------- Tests --------
 
-from pytest import fixture
+from pathlib import Path
+from pytest import fixture, raises
 
 class Test:
     @fixture
@@ -88,3 +483,54 @@ class Test:
 
     def test_example_2(self, machines: List[Machine]) -> None:
         assert sum(minimum_button_presses(machine, voltage=True) for machine in machines) == 33
+
+    def test_minimum_light_presses(self, machines: List[Machine]) -> None:
+        for machine in machines:
+            masks, target = button_masks(machine), light_mask(machine)
+            solution = solve_gf2(masks, target)
+
+            assert solution is not None
+            assert min_weight_by_null_space(*solution) == min_weight_by_halves(masks, target)
+
+        assert [minimum_light_presses(machine) for machine in machines] == [2, 3, 2]
+        assert solve_gf2([0b011, 0b110], 0b001) is None
+
+    def test_native_button_presses(self, machines: List[Machine]) -> None:
+        assert [native_button_presses(machine) for machine in machines] == [10, 12, 11]
+        assert [minimum_button_presses(machine, voltage=True, search_limit=0) for machine in machines] == [10, 12, 11]
+        assert all(native_button_presses(machine) == z3_button_presses(machine) for machine in generate_machines(10))
+
+    def test_solve_machines(self, machines: List[Machine]) -> None:
+        assert list(solve_machines(machines, jobs=2)) == [(2, 10), (3, 12), (2, 11)]
+        assert solve_machine(machines[0], timeout=0) == (2, None)
+
+    def test_jobs_must_be_positive(self) -> None:
+        assert positive_int("4") == 4
+
+        for value in ["0", "-1"]:
+            with raises(ArgumentTypeError):
+                positive_int(value)
+
+    def test_solution_cache(self, machines: List[Machine], tmp_path: Path) -> None:
+        cache = SolutionCache.open(str(tmp_path / "solutions.db"))
+
+        assert list(solve_cached_machines(machines, cache)) == [(2, 10), (3, 12), (2, 11)]
+        assert (cache.hits, cache.misses) == (0, 6)
+
+        # solutions are committed as the run goes, not only once the cache is closed
+        other = connect(str(tmp_path / "solutions.db"))
+        assert other.execute("SELECT COUNT(*) FROM solutions").fetchone() == (6,)
+        other.close()
+        assert list(solve_cached_machines(machines, cache)) == [(2, 10), (3, 12), (2, 11)]
+        assert (cache.hits, cache.misses) == (6, 6)
+
+        shuffled = Machine(machines[0].light_diagram, machines[0].buttons[::-1] * 2, machines[0].voltage_requirements)
+        assert machine_key(shuffled, True) == machine_key(machines[0], True)
+        assert machine_key(machines[0], False) != machine_key(machines[0], True)
+
+        cache.max_entries = 2
+        cache.close()
+
+        cache = SolutionCache.open(str(tmp_path / "solutions.db"))
+        assert cache.connection.execute("SELECT COUNT(*) FROM solutions").fetchone() == (2,)
+        cache.close()